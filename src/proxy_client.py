@@ -1,4 +1,5 @@
 import asyncio
+import sys
 from fastmcp.client import Client
 from fastmcp.client.transports import SSETransport
 
@@ -9,20 +10,23 @@ async def fetch_all_resources(proxy_url: str):
     async with client:
         print(f"Fetching data from proxy server {proxy_url}...")
         print("-------------")
-        tools = await client.session.list_tools()
-        print(f"Tools from proxy server {proxy_url}:")
-        for tool in tools.tools:
-            print(f"  Name: {tool.name}, Description: {tool.description}")
-
-        prompts = await client.session.list_prompts()
-        print(f"Prompts from proxy server {proxy_url}:")
-        for prompt in prompts.prompts:
-            print(f"  Name: {prompt.name}, Description: {prompt.description}")
-
-        result = await client.session.list_resources()
-        print(f"Resources from proxy server {proxy_url}:")
-        for resource in result.resources:
-            print(f"  URI: {resource.uri}, Name: {resource.name}, Description: {resource.description}")
+        # The three listings are independent, so fetch them concurrently
+        tools, prompts, result = await asyncio.gather(
+            client.session.list_tools(),
+            client.session.list_prompts(),
+            client.session.list_resources(),
+        )
+        # Render the whole listing up front and write it out in one call
+        lines = [f"Tools from proxy server {proxy_url}:"]
+        lines.extend(f"  Name: {tool.name}, Description: {tool.description}" for tool in tools.tools)
+        lines.append(f"Prompts from proxy server {proxy_url}:")
+        lines.extend(f"  Name: {prompt.name}, Description: {prompt.description}" for prompt in prompts.prompts)
+        lines.append(f"Resources from proxy server {proxy_url}:")
+        lines.extend(
+            f"  URI: {resource.uri}, Name: {resource.name}, Description: {resource.description}"
+            for resource in result.resources
+        )
+        sys.stdout.write("\n".join(lines) + "\n")
 
 if __name__ == "__main__":
     # Connect to the running MultiFastMCP server (default: localhost:9000)
@@ -1,11 +1,14 @@
 import asyncio
-from typing import Any, Dict, Optional
+import logging
+import re
+from types import MappingProxyType
+from typing import AbstractSet, Any, Dict, Mapping, Optional
 from fastmcp.server.proxy import ProxyTool, FastMCPProxy
 from fastmcp import FastMCP
 from fastmcp.client import Client
-from fastmcp.client.transports import SSETransport
+from fastmcp.client.transports import SSETransport, WSTransport
 from mcp.shared.exceptions import McpError
-from mcp.types import GetPromptResult, TextContent, ImageContent, EmbeddedResource
+from mcp.types import CONNECTION_CLOSED, GetPromptResult, TextContent, ImageContent, EmbeddedResource
 from mcp.server.lowlevel.helper_types import ReadResourceContents
 from pydantic.networks import AnyUrl
 from fastmcp.prompts import Prompt
@@ -15,15 +18,52 @@ from fastmcp.utilities.logging import get_logger
 
 logger = get_logger(__name__)
 
+# Default number of seconds between background refreshes of the upstream capability maps
+DEFAULT_REFRESH_INTERVAL = 60.0
 
-# all_from_real_server remains the same as in the original proxy_server.py
+# Default upper bound on concurrent requests to upstream servers while building the maps
+DEFAULT_MAX_CONCURRENT_UPSTREAMS = 16
+
+# Default number of seconds to wait for an upstream session to open
+DEFAULT_CONNECT_TIMEOUT = 10.0
+
+# Matches a URI template parameter such as {user_id} or a wildcard parameter such as {path*}
+_TEMPLATE_PARAM_RE = re.compile(r"\{(\w+)(\*)?\}")
+
+
+def _template_to_pattern(uri_template: str) -> str:
+    """
+    Converts a URI template into a regex fragment matching the URIs it describes,
+    e.g. `data://user/{user_id}` -> `data://user/[^/]+`.
+    Parameters are left as non-capturing so fragments can be combined into one alternation.
+    """
+    parts = []
+    pos = 0
+    for match in _TEMPLATE_PARAM_RE.finditer(uri_template):
+        parts.append(re.escape(uri_template[pos:match.start()]))
+        parts.append(".+" if match.group(2) else "[^/]+")
+        pos = match.end()
+    parts.append(re.escape(uri_template[pos:]))
+    return "".join(parts)
+
+
+def _is_transport_error(exc: BaseException) -> bool:
+    """
+    Tells whether an upstream request failed because the connection itself is broken,
+    as opposed to the upstream answering with an error (e.g. a list method it does not implement).
+    """
+    if isinstance(exc, McpError):
+        return getattr(exc.error, "code", None) == CONNECTION_CLOSED
+    return True
+
+
+# all_from_real_server expects an already connected client (see MultiFastMCP.connect)
 async def all_from_real_server(client: "Client") -> list["ProxyTool"]:
-    async with client:
-        result = await client.session.list_tools()
-        return [
-            await ProxyTool.from_client(client, tool)
-            for tool in result.tools
-        ]
+    result = await client.session.list_tools()
+    return [
+        await ProxyTool.from_client(client, tool)
+        for tool in result.tools
+    ]
 
 class MultiFastMCP(FastMCP):
     """
@@ -32,188 +72,368 @@ class MultiFastMCP(FastMCP):
     execution requests to the appropriate upstream server.
     Supports the MCP protocol (SSE/WS endpoints).
     """
-    def __init__(self, proxies: list[FastMCPProxy], name="MultiFastMCP"):
+    def __init__(
+        self,
+        proxies: list[FastMCPProxy],
+        name="MultiFastMCP",
+        refresh_interval: Optional[float] = DEFAULT_REFRESH_INTERVAL,
+        max_concurrent_upstreams: int = DEFAULT_MAX_CONCURRENT_UPSTREAMS,
+        connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+    ):
         """
         Initializes the MultiFastMCP.
 
         Args:
             proxies: A list of FastMCPProxy instances, each connected to an upstream server.
             name: The name for this aggregating proxy server.
+            refresh_interval: Seconds between background rebuilds of the capability maps
+                while the server is running. None or 0 disables the refresh.
+            max_concurrent_upstreams: Maximum number of upstream servers queried
+                at once while building the capability maps.
+            connect_timeout: Seconds to wait for a persistent upstream session to open.
         """
         super().__init__(name)
 
         if not proxies:
             logger.warning("MultiFastMCP initialized with no upstream proxies.")
         self.proxies: list[FastMCPProxy] = proxies
+        self.refresh_interval = refresh_interval
+        self.connect_timeout = connect_timeout
+
+        # Internal maps to track which proxy owns which item
+        self._tool_map: Dict[str, FastMCPProxy] = {}
+        self._resource_map: Dict[str, FastMCPProxy] = {}
+        self._prompt_map: Dict[str, FastMCPProxy] = {}
+        self._resource_template_map: Dict[str, FastMCPProxy] = {}
+
+        # Aggregated read-only views (populated together by _build_all_maps), returned
+        # as-is by get_*: callers cannot mutate the cached maps behind our back
+        self._aggregated_tools: Mapping[str, Tool] = MappingProxyType({})
+        self._aggregated_resources: Mapping[str, Resource] = MappingProxyType({})
+        self._aggregated_prompts: Mapping[str, Prompt] = MappingProxyType({})
+        self._aggregated_resource_templates: Mapping[str, ResourceTemplate] = MappingProxyType({})
+
+        # All template URIs compiled into one alternation; group g<i> maps to _template_owners[i]
+        self._template_regex: Optional[re.Pattern] = None
+        self._template_owners: list[tuple[str, FastMCPProxy]] = []
+
+        # A single lock guards the one-shot build of all maps
+        self._maps_lock = asyncio.Lock()
+        self._maps_built = asyncio.Event()
+
+        # Bounds the map-building fan-out so many upstreams are not hit all at once
+        self._fanout_sem = asyncio.Semaphore(max_concurrent_upstreams)
+
+        # Conflicts and upstream failures seen by the last map build; a refresh that
+        # sees the same ones again logs them at debug level instead of repeating them
+        self._reported_issues: frozenset[tuple[str, ...]] = frozenset()
+
+        # One long-lived session per upstream client: its holder task and stop event (see connect/aclose)
+        self._sessions: Dict[FastMCPProxy, tuple[asyncio.Task, asyncio.Event]] = {}
+        # Upstreams whose last session open failed; repeated failures are logged at debug level
+        self._unreachable: set[FastMCPProxy] = set()
+
+    async def connect(self):
+        """
+        Opens one persistent session per reachable upstream client.
+        While a session is open, the `async with client:` blocks used by FastMCPProxy
+        reuse it instead of performing a new transport handshake and MCP initialize
+        roundtrip on every request. Upstreams whose session cannot be opened are
+        logged and left on that per-request path; the refresh loop retries them.
+        """
+        pending = [proxy for proxy in self.proxies if proxy not in self._sessions]
+        opened = await asyncio.gather(*(self._open_session(proxy) for proxy in pending))
+        logger.info("Opened persistent sessions to %d of %d upstream servers.", sum(opened), len(pending))
 
-        # Internal caches and maps to track which proxy owns which item
-        self._tool_map: Optional[Dict[str, FastMCPProxy]] = None
-        self._resource_map: Optional[Dict[str, FastMCPProxy]] = None
-        self._prompt_map: Optional[Dict[str, FastMCPProxy]] = None
-        self._resource_template_map: Optional[Dict[str, FastMCPProxy]] = None # Added for templates
-
-        # Aggregated views (cached after first calculation)
-        self._aggregated_tools: Optional[Dict[str, Tool]] = None
-        self._aggregated_resources: Optional[Dict[str, Resource]] = None
-        self._aggregated_prompts: Optional[Dict[str, Prompt]] = None
-        self._aggregated_resource_templates: Optional[Dict[str, ResourceTemplate]] = None # Added
-
-        # Locks to prevent race conditions during map/cache population
-        self._tools_lock = asyncio.Lock()
-        self._resources_lock = asyncio.Lock()
-        self._prompts_lock = asyncio.Lock()
-        self._templates_lock = asyncio.Lock() # Added
-
-    async def _build_tool_map(self):
-        """Builds the map of tool names to the proxy that provides them."""
-        async with self._tools_lock:
-            if self._tool_map is not None:
-                return
+    async def aclose(self):
+        """Closes the persistent upstream sessions opened by connect."""
+        await asyncio.gather(*(self._close_session(proxy) for proxy in list(self._sessions)))
 
-            logger.info("Building tool map for MultiFastMCP...")
-            tool_map: Dict[str, FastMCPProxy] = {}
-            aggregated_tools: Dict[str, Tool] = {}
-            tasks = [proxy.get_tools() for proxy in self.proxies]
-            results = await asyncio.gather(*tasks, return_exceptions=True)
-
-            for i, result in enumerate(results):
-                proxy = self.proxies[i]
-                if isinstance(result, Exception):
-                    logger.error(f"Failed to get tools from proxy {proxy.name} (client: {proxy.client.transport.base_url}): {result}")
-                    continue
-                if isinstance(result, dict):
-                    for tool_name, tool_instance in result.items():
-                        if tool_name in tool_map:
-                            logger.warning(f"Tool name conflict: '{tool_name}' exists on multiple upstream servers. Using the one from {proxy.name}.")
-                        tool_map[tool_name] = proxy
-                        aggregated_tools[tool_name] = tool_instance # Use the actual Tool instance
-                else:
-                     logger.error(f"Unexpected result type {type(result)} when getting tools from proxy {proxy.name}")
-
-            self._tool_map = tool_map
-            self._aggregated_tools = aggregated_tools
-            logger.info(f"Tool map built. Found {len(self._tool_map)} unique tools.")
-
-    async def get_tools(self) -> dict[str, Tool]:
-        """Gets aggregated tools, building the internal map if needed."""
-        if self._tool_map is None:
-            await self._build_tool_map()
-        # Ensure map and cache are not None after build attempt
-        return self._aggregated_tools if self._aggregated_tools is not None else {}
-
-    async def _build_resource_map(self):
-        """Builds the map of resource URIs/template URIs to the proxy that provides them."""
-        async with self._resources_lock:
-            if self._resource_map is not None:
-                return
+    async def _open_session(self, proxy: FastMCPProxy) -> bool:
+        """
+        Opens a persistent session to one upstream in a dedicated holder task.
+        The transport's task groups must be entered and exited by the same task,
+        so the session lives in its own task rather than in the caller's.
+
+        Returns:
+            True if the session was opened, False if it failed (the error is logged).
+        """
+        opened = asyncio.get_running_loop().create_future()
+        stop = asyncio.Event()
+        task = asyncio.create_task(self._hold_session(proxy, opened, stop))
+        try:
+            await asyncio.wait_for(opened, self.connect_timeout)
+            self._sessions[proxy] = (task, stop)
+            if proxy in self._unreachable:
+                self._unreachable.discard(proxy)
+                logger.info("Reopened a persistent session to %s.", proxy.name)
+            return True
+        except Exception as e:
+            level = logging.DEBUG if proxy in self._unreachable else logging.WARNING
+            self._unreachable.add(proxy)
+            logger.log(level, "Could not open a persistent session to %s, using per-request connections: %s", proxy.name, e)
+            return False
+        finally:
+            # Also reached when the caller is cancelled: a session that was never
+            # registered would otherwise be left open where aclose cannot see it
+            if self._sessions.get(proxy, (None,))[0] is not task:
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+
+    async def _hold_session(self, proxy: FastMCPProxy, opened: asyncio.Future, stop: asyncio.Event):
+        """Keeps `proxy.client` entered until `stop` is set or its transport fails."""
+        try:
+            async with proxy.client:
+                if not opened.done():
+                    opened.set_result(None)
+                await stop.wait()
+        except asyncio.CancelledError:
+            if not opened.done():
+                opened.cancel()
+            raise
+        except Exception as e:
+            if not opened.done():
+                opened.set_exception(e)
+            else:
+                logger.warning("Persistent session to %s closed unexpectedly: %s", proxy.name, e)
+        finally:
+            # Forget the session if it ended on its own, so calls fall back to per-request connections
+            if self._sessions.get(proxy, (None,))[0] is asyncio.current_task():
+                del self._sessions[proxy]
+
+    async def _close_session(self, proxy: FastMCPProxy):
+        """Closes the persistent session to one upstream, if it has one."""
+        session = self._sessions.pop(proxy, None)
+        if session is None:
+            return
+        task, stop = session
+        stop.set()
+        await asyncio.gather(task, return_exceptions=True)
+
+    async def _reopen_sessions(self, proxies) -> bool:
+        """
+        Closes and reopens the persistent sessions of the given upstreams,
+        e.g. after one restarted and its old session went stale.
 
-            logger.info("Building resource map for MultiFastMCP...")
-            resource_map: Dict[str, FastMCPProxy] = {}
-            aggregated_resources: Dict[str, Resource] = {}
-            tasks = [proxy.get_resources() for proxy in self.proxies]
-            results = await asyncio.gather(*tasks, return_exceptions=True)
-
-            for i, result in enumerate(results):
-                logger.debug(f"Processing resources from proxy {self.proxies[i].name}...")
-                proxy = self.proxies[i]
-                if isinstance(result, Exception):
-                    logger.error(f"Failed to get resources from proxy {proxy.name}: {result}")
-                    for exc in result.exceptions:
-                        logger.error("TaskGroup sub-exception: %s", exc, exc_info=True)
-                    continue
-                if isinstance(result, dict):
-                    for res_uri, res_instance in result.items():
-                        if res_uri in resource_map:
-                            logger.warning(f"Resource URI conflict: '{res_uri}' exists on multiple upstream servers. Using the one from {proxy.name}.")
-                        resource_map[res_uri] = proxy
-                        aggregated_resources[res_uri] = res_instance
-                else:
-                    logger.error(f"Unexpected result type {type(result)} when getting resources from proxy {proxy.name}")
-
-            self._resource_map = resource_map
-            self._aggregated_resources = aggregated_resources
-            logger.info(f"Resource map built. Found {len(self._resource_map)} unique resources.")
-
-        # --- Also build resource template map ---
-        async with self._templates_lock:
-            if self._resource_template_map is not None:
+        Returns:
+            True if at least one session was reopened.
+        """
+        async def reopen(proxy):
+            await self._close_session(proxy)
+            return await self._open_session(proxy)
+        return any(await asyncio.gather(*(reopen(proxy) for proxy in proxies)))
+
+    @staticmethod
+    def _merge_upstream_items(
+        proxy: FastMCPProxy,
+        kind: str,
+        key_label: str,
+        result: Any,
+        owner_map: Dict[str, FastMCPProxy],
+        aggregated: Dict[str, Any],
+        reported: AbstractSet[tuple[str, ...]],
+        issues: set[tuple[str, ...]],
+    ):
+        """
+        Merges one upstream `get_*` result into the owner map and aggregated view.
+
+        Args:
+            proxy: The proxy the result was fetched from.
+            kind: Plural name of the items, used for logging (e.g. "tools").
+            key_label: Label of the item key, used for logging (e.g. "Tool name").
+            result: The dict returned by the proxy, or the exception it raised.
+            owner_map: Map of item key to the proxy that provides it.
+            aggregated: Map of item key to the item instance.
+            reported: Issues already logged by the previous build; these are logged at debug level.
+            issues: Collects the failures and conflicts found by this build.
+        """
+        if isinstance(result, BaseException):
+            issue = ("failed", kind, proxy.name)
+            issues.add(issue)
+            if issue in reported:
+                logger.debug("Still failing to get %s from proxy %s: %s", kind, proxy.name, result)
                 return
+            logger.error("Failed to get %s from proxy %s: %s", kind, proxy.name, result)
+            # Upstream transports run in task groups, so failures often arrive grouped
+            if isinstance(result, BaseExceptionGroup):
+                for exc in result.exceptions:
+                    logger.error("TaskGroup sub-exception: %s", exc, exc_info=exc)
+            return
+        if not isinstance(result, dict):
+            logger.error("Unexpected result type %s when getting %s from proxy %s", type(result), kind, proxy.name)
+            return
+        # Only keys already owned by another proxy can conflict; everything else
+        # is merged with C-level dict updates instead of a per-item Python loop.
+        for key in owner_map.keys() & result.keys():
+            issue = ("conflict", kind, key, proxy.name)
+            issues.add(issue)
+            level = logging.DEBUG if issue in reported else logging.WARNING
+            logger.log(level, "%s conflict: '%s' exists on multiple upstream servers. Using the one from %s.", key_label, key, proxy.name)
+        owner_map.update(dict.fromkeys(result, proxy))
+        aggregated.update(result)
+
+    async def _fetch_upstream(self, proxy: FastMCPProxy) -> tuple[list[Any], bool]:
+        """
+        Fetches the tools, resources, resource templates and prompts of one upstream
+        while holding a fan-out semaphore slot. The client is entered once around all
+        four requests: it reuses the persistent session if one is open, and otherwise
+        opens a single connection that is closed by this same task.
+
+        Returns:
+            The four results in that order, each either a dict or the exception raised,
+            and whether the connection to the upstream is broken: the client could not
+            be entered, or all four requests failed with a transport error.
+        """
+        async with self._fanout_sem:
+            try:
+                async with proxy.client:
+                    results = await asyncio.gather(
+                        proxy.get_tools(),
+                        proxy.get_resources(),
+                        proxy.get_resource_templates(),
+                        proxy.get_prompts(),
+                        return_exceptions=True,
+                    )
+            except Exception as e:
+                return [e] * 4, True
+        broken = all(isinstance(result, BaseException) and _is_transport_error(result) for result in results)
+        return results, broken
+
+    async def _build_all_maps(self):
+        """
+        Builds the tool, resource, resource template and prompt maps in one pass.
+        All upstream proxies are queried concurrently, each for all four item kinds
+        at once, so the build waits on the slowest upstream once instead of once per map.
 
-            logger.info("Building resource template map for MultiFastMCP...")
-            template_map: Dict[str, FastMCPProxy] = {}
-            aggregated_templates: Dict[str, ResourceTemplate] = {}
-            tasks_templates = [proxy.get_resource_templates() for proxy in self.proxies]
-            results_templates = await asyncio.gather(*tasks_templates, return_exceptions=True)
-
-            for i, result in enumerate(results_templates):
-                proxy = self.proxies[i]
-                if isinstance(result, Exception):
-                    logger.error(f"Failed to get resource templates from proxy {proxy.name}: {result}")
-                    continue
-                if isinstance(result, dict):
-                    for template_uri, template_instance in result.items():
-                        if template_uri in template_map:
-                            logger.warning(f"Resource template URI conflict: '{template_uri}' exists on multiple upstream servers. Using the one from {proxy.name}.")
-                        template_map[template_uri] = proxy
-                        aggregated_templates[template_uri] = template_instance
-                else:
-                     logger.error(f"Unexpected result type {type(result)} when getting resource templates from proxy {proxy.name}")
-
-            self._resource_template_map = template_map
-            self._aggregated_resource_templates = aggregated_templates
-            logger.info(f"Resource template map built. Found {len(self._resource_template_map)} unique templates.")
-
-
-    async def get_resources(self) -> dict[str, Resource]:
-        """Gets aggregated resources, building the internal map if needed."""
-        if self._resource_map is None:
-            await self._build_resource_map()
-        return self._aggregated_resources if self._aggregated_resources is not None else {}
-
-    async def get_resource_templates(self) -> dict[str, ResourceTemplate]:
-        """Gets aggregated resource templates, building the internal map if needed."""
-        # Ensure the main resource map build runs first, as it includes templates
-        if self._resource_template_map is None:
-             await self._build_resource_map() # This function now builds both maps
-        return self._aggregated_resource_templates if self._aggregated_resource_templates is not None else {}
-
-
-    async def _build_prompt_map(self):
-        """Builds the map of prompt names to the proxy that provides them."""
-        async with self._prompts_lock:
+        Returns:
+            The proxies whose connection is broken (see _fetch_upstream).
+        """
+        logger.info("Building capability maps for MultiFastMCP...")
+        results = await asyncio.gather(*(self._fetch_upstream(proxy) for proxy in self.proxies))
+
+        tool_map: Dict[str, FastMCPProxy] = {}
+        resource_map: Dict[str, FastMCPProxy] = {}
+        template_map: Dict[str, FastMCPProxy] = {}
+        prompt_map: Dict[str, FastMCPProxy] = {}
+        aggregated_tools: Dict[str, Tool] = {}
+        aggregated_resources: Dict[str, Resource] = {}
+        aggregated_templates: Dict[str, ResourceTemplate] = {}
+        aggregated_prompts: Dict[str, Prompt] = {}
+
+        broken = []
+        reported, issues = self._reported_issues, set()
+        for proxy, ((tools, resources, templates, prompts), is_broken) in zip(self.proxies, results):
+            self._merge_upstream_items(proxy, "tools", "Tool name", tools, tool_map, aggregated_tools, reported, issues)
+            self._merge_upstream_items(proxy, "resources", "Resource URI", resources, resource_map, aggregated_resources, reported, issues)
+            self._merge_upstream_items(proxy, "resource templates", "Resource template URI", templates, template_map, aggregated_templates, reported, issues)
+            self._merge_upstream_items(proxy, "prompts", "Prompt name", prompts, prompt_map, aggregated_prompts, reported, issues)
+            if is_broken:
+                broken.append(proxy)
+
+        template_owners = list(template_map.items())
+        template_regex = None
+        if template_owners:
+            template_regex = re.compile("|".join(
+                f"(?P<g{i}>{_template_to_pattern(template_uri)})"
+                for i, (template_uri, _) in enumerate(template_owners)
+            ))
+
+        self._tool_map, self._aggregated_tools = tool_map, MappingProxyType(aggregated_tools)
+        self._resource_map, self._aggregated_resources = resource_map, MappingProxyType(aggregated_resources)
+        self._resource_template_map, self._aggregated_resource_templates = template_map, MappingProxyType(aggregated_templates)
+        self._template_regex, self._template_owners = template_regex, template_owners
+        self._prompt_map, self._aggregated_prompts = prompt_map, MappingProxyType(aggregated_prompts)
+        self._reported_issues = frozenset(issues)
+        logger.info(
+            "Capability maps built. Found %d tools, %d resources, %d resource templates and %d prompts.",
+            len(tool_map), len(resource_map), len(template_map), len(prompt_map),
+        )
+        return broken
+
+    async def _ensure_maps(self):
+        """
+        Builds all capability maps on first use; a no-op once they are built.
+        Request handlers check `_maps_built` before awaiting this, so once the maps
+        are prefetched their hot path is a flag check and a single dict lookup.
+        """
+        if self._maps_built.is_set():
+            return
+        async with self._maps_lock:
             # Double check locking pattern
-            if self._prompt_map is not None:
+            if self._maps_built.is_set():
                 return
+            await self._build_all_maps()
+            self._maps_built.set()
 
-            logger.info("Building prompt map for MultiFastMCP...")
-            prompt_map: Dict[str, FastMCPProxy] = {}
-            aggregated_prompts: Dict[str, Prompt] = {}
-            tasks = [proxy.get_prompts() for proxy in self.proxies]
-            results = await asyncio.gather(*tasks, return_exceptions=True)
-
-            for i, result in enumerate(results):
-                proxy = self.proxies[i]
-                if isinstance(result, Exception):
-                    logger.error(f"Failed to get prompts from proxy {proxy.name}: {result}")
-                    continue
-                if isinstance(result, dict):
-                    for prompt_name, prompt_instance in result.items():
-                        if prompt_name in prompt_map:
-                            logger.warning(f"Prompt name conflict: '{prompt_name}' exists on multiple upstream servers. Using the one from {proxy.name}.")
-                        prompt_map[prompt_name] = proxy
-                        aggregated_prompts[prompt_name] = prompt_instance
-                else:
-                     logger.error(f"Unexpected result type {type(result)} when getting prompts from proxy {proxy.name}")
-
-            self._prompt_map = prompt_map
-            self._aggregated_prompts = aggregated_prompts
-            logger.info(f"Prompt map built. Found {len(self._prompt_map)} unique prompts.")
-
-    async def get_prompts(self) -> dict[str, Prompt]:
-        """Gets aggregated prompts, building the internal map if needed."""
-        if self._prompt_map is None:
-            await self._build_prompt_map()
-        return self._aggregated_prompts if self._aggregated_prompts is not None else {}
+    async def _refresh_loop(self):
+        """
+        Periodically rebuilds the capability maps to pick up upstream changes.
+        The sessions of upstreams whose connection is broken are reopened (an upstream
+        may have restarted, leaving its old session stale), and if any of them
+        comes back the maps are rebuilt right away. An upstream that merely answers
+        some list request with an error keeps its session. Upstreams that answered
+        over per-request connections get their persistent session back.
+        """
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                broken = await self._rebuild_maps()
+                await asyncio.gather(*(
+                    self._open_session(proxy) for proxy in self.proxies
+                    if proxy not in self._sessions and proxy not in broken
+                ))
+                # Only rebuild again if a session was actually reopened
+                if broken and await self._reopen_sessions(broken):
+                    await self._rebuild_maps()
+            except Exception as e:
+                logger.error("Failed to refresh capability maps: %s", e)
+
+    async def _rebuild_maps(self) -> list[FastMCPProxy]:
+        """Rebuilds all capability maps, returning the proxies whose connection is broken."""
+        async with self._maps_lock:
+            # The maps are swapped in at the end of the build, so requests
+            # keep being served from the previous maps in the meantime.
+            broken = await self._build_all_maps()
+            self._maps_built.set()
+        return broken
+
+    async def run_sse_async(self, *args, **kwargs):
+        """
+        Runs the SSE server with persistent upstream sessions, refreshing the
+        capability maps in the background.
+        """
+        await self.connect() # Only opens the sessions not already open
+        refresh_task = None
+        if self.refresh_interval:
+            refresh_task = asyncio.create_task(self._refresh_loop())
+        try:
+            await super().run_sse_async(*args, **kwargs)
+        finally:
+            if refresh_task is not None:
+                refresh_task.cancel()
+                # Let a session open in progress clean up before the sessions are closed
+                await asyncio.gather(refresh_task, return_exceptions=True)
+            await self.aclose()
+
+    async def get_tools(self) -> Mapping[str, Tool]:
+        """Gets aggregated tools, building the internal maps if needed."""
+        await self._ensure_maps()
+        return self._aggregated_tools
+
+    async def get_resources(self) -> Mapping[str, Resource]:
+        """Gets aggregated resources, building the internal maps if needed."""
+        await self._ensure_maps()
+        return self._aggregated_resources
+
+    async def get_resource_templates(self) -> Mapping[str, ResourceTemplate]:
+        """Gets aggregated resource templates, building the internal maps if needed."""
+        await self._ensure_maps()
+        return self._aggregated_resource_templates
+
+    async def get_prompts(self) -> Mapping[str, Prompt]:
+        """Gets aggregated prompts, building the internal maps if needed."""
+        await self._ensure_maps()
+        return self._aggregated_prompts
 
     # --- MCP Method Implementations ---
 
@@ -221,76 +441,43 @@ class MultiFastMCP(FastMCP):
         self, key: str, arguments: dict[str, Any]
     ) -> list[TextContent | ImageContent | EmbeddedResource]:
         """Finds the correct upstream proxy and delegates the tool call."""
-        if self._tool_map is None:
-            await self._build_tool_map() # Ensure map is built
-
-        if self._tool_map is None: # Check again after build attempt
-             raise McpError(f"Tool map could not be built.")
+        if not self._maps_built.is_set():
+            await self._ensure_maps()
 
         target_proxy = self._tool_map.get(key)
         if target_proxy:
-            logger.debug(f"Delegating tool call '{key}' to proxy {target_proxy.name}")
+            logger.debug("Delegating tool call '%s' to proxy %s", key, target_proxy.name)
             # Delegate to the specific proxy's _mcp_call_tool method
             # The FastMCPProxy._mcp_call_tool already handles calling the client
             return await target_proxy._mcp_call_tool(key, arguments)
         else:
-            logger.error(f"Tool '{key}' not found on any upstream server.")
+            logger.error("Tool '%s' not found on any upstream server.", key)
             # Raise McpError as expected by MCP if the tool isn't found
             raise McpError(f"Unknown tool: {key}")
 
     async def _mcp_read_resource(self, uri: AnyUrl | str) -> list[ReadResourceContents]:
         """Finds the correct upstream proxy and delegates the resource read."""
         uri_str = str(uri) # Ensure we have a string for map lookup
+        if not self._maps_built.is_set():
+            await self._ensure_maps() # Builds both resource and template maps
 
         # Check exact match in static resources first
-        if self._resource_map is None:
-            await self._build_resource_map() # Builds both resource and template maps
-
-        if self._resource_map is None: # Check again after build attempt
-             raise McpError(f"Resource map could not be built.")
-
         target_proxy = self._resource_map.get(uri_str)
         if target_proxy:
-            logger.debug(f"Delegating resource read '{uri_str}' to proxy {target_proxy.name}")
+            logger.debug("Delegating resource read '%s' to proxy %s", uri_str, target_proxy.name)
             return await target_proxy._mcp_read_resource(uri)
 
-        # If not found in static resources, check templates
-        if self._resource_template_map is None:
-             # This should have been built by _build_resource_map already, but check just in case
-             await self._build_resource_map()
-
-        if self._resource_template_map is None: # Check again
-             raise McpError(f"Resource template map could not be built.")
-
-        # Find a matching template
-        # This requires iterating and checking if the URI matches a template pattern.
-        # The base FastMCP server handles this matching logic internally using registered templates.
-        # We need to find the proxy that *owns* the matching template.
-        matching_template_proxy: Optional[FastMCPProxy] = None
-        matching_template_uri: Optional[str] = None
-
-        # Iterate through the templates registered *on this multi-proxy*
-        # which are actually the aggregated templates from upstream
-        aggregated_templates = await self.get_resource_templates()
-        for template_uri, template_instance in aggregated_templates.items():
-             if template_instance.matches(uri_str):
-                 # Now find which *upstream* proxy owns this template_uri
-                 proxy_owner = self._resource_template_map.get(template_uri)
-                 if proxy_owner:
-                     matching_template_proxy = proxy_owner
-                     matching_template_uri = template_uri # Store the template URI for logging
-                     break # Found the first match
-                 else:
-                     # This case should ideally not happen if maps are built correctly
-                     logger.error(f"Found matching template '{template_uri}' but couldn't find its owning proxy!")
-
-
-        if matching_template_proxy and matching_template_uri:
-            logger.debug(f"Delegating resource read '{uri_str}' (matching template '{matching_template_uri}') to proxy {matching_template_proxy.name}")
+        # If not found in static resources, find the first matching template.
+        # All templates are precompiled into a single regex, so this is one match
+        # call instead of evaluating every template in turn.
+        match = self._template_regex.fullmatch(uri_str) if self._template_regex else None
+        if match:
+            template_uri, template_proxy = self._template_owners[int(match.lastgroup[1:])]
+            logger.debug("Delegating resource read '%s' (matching template '%s') to proxy %s", uri_str, template_uri, template_proxy.name)
             # Delegate to the proxy that owns the template
-            return await matching_template_proxy._mcp_read_resource(uri)
+            return await template_proxy._mcp_read_resource(uri)
         else:
-            logger.error(f"Resource URI '{uri_str}' not found as static resource or matching template on any upstream server.")
+            logger.error("Resource URI '%s' not found as static resource or matching template on any upstream server.", uri_str)
             raise McpError(f"Unknown resource: {uri_str}")
 
 
@@ -298,23 +485,53 @@ class MultiFastMCP(FastMCP):
         self, name: str, arguments: dict[str, Any] | None = None
     ) -> GetPromptResult:
         """Finds the correct upstream proxy and delegates the prompt rendering."""
-        if self._prompt_map is None:
-            await self._build_prompt_map() # Ensure map is built
-
-        if self._prompt_map is None: # Check again after build attempt
-             raise McpError(f"Prompt map could not be built.")
+        if not self._maps_built.is_set():
+            await self._ensure_maps()
 
         target_proxy = self._prompt_map.get(name)
         if target_proxy:
-            logger.debug(f"Delegating prompt render '{name}' to proxy {target_proxy.name}")
+            logger.debug("Delegating prompt render '%s' to proxy %s", name, target_proxy.name)
             # Delegate to the specific proxy's _mcp_get_prompt method
             return await target_proxy._mcp_get_prompt(name, arguments)
         else:
-            logger.error(f"Prompt '{name}' not found on any upstream server.")
+            logger.error("Prompt '%s' not found on any upstream server.", name)
             raise McpError(f"Unknown prompt: {name}")
 
 # --- Server Setup and Running Logic --- (from original proxy_server.py)
 
+async def _probe_client(client: Client, timeout: float = DEFAULT_CONNECT_TIMEOUT):
+    """Opens and closes one session on `client`, raising if that takes longer than `timeout` seconds."""
+    async def open_and_close():
+        async with client:
+            pass
+    await asyncio.wait_for(open_and_close(), timeout)
+
+
+async def _create_upstream_client(url: str) -> Optional[Client]:
+    """
+    Creates the client for an upstream server given its SSE URL.
+    Prefers the upstream's WebSocket endpoint (same host, `/ws` instead of `/sse`),
+    which carries both directions over one connection, and falls back to SSE
+    when the upstream does not expose it.
+    Returns None if the upstream cannot be reached over either transport.
+    """
+    ws_url = url.replace("http", "ws", 1).removesuffix("/sse") + "/ws"
+    ws_client = Client(transport=WSTransport(ws_url))
+    try:
+        # Probe once at startup; the persistent session is opened later by MultiFastMCP.connect
+        await _probe_client(ws_client)
+        return ws_client
+    except Exception as e:
+        logger.info("WebSocket endpoint %s not available (%s), falling back to SSE.", ws_url, e)
+    sse_client = Client(transport=SSETransport(url))
+    try:
+        await _probe_client(sse_client)
+        return sse_client
+    except Exception as e:
+        logger.error("Upstream server %s is not reachable (%s), skipping it.", url, e)
+        return None
+
+
 async def create_proxy_server():
     """Create and return a FastMCP-compatible proxy that aggregates multiple FastMCPProxy instances."""
     # Example: Assume 3 real FastMCP servers are running on ports 8001, 8002, 8003
@@ -327,12 +544,15 @@ async def create_proxy_server():
     ]
     proxies = []
     print("Attempting to connect to upstream servers:")
-    for url in server_urls:
-        print(f" - {url}")
+    # Pick the transport for every upstream concurrently (WebSocket if exposed, SSE otherwise)
+    clients = await asyncio.gather(*(_create_upstream_client(url) for url in server_urls))
+    for url, client in zip(server_urls, clients):
+        if client is None:
+            print(f" - {url} ... FAILED to connect (no WebSocket or SSE endpoint reachable), skipping it")
+            continue
+        print(f" - {url} ({type(client.transport).__name__})")
         # Use a timeout for client creation to avoid hanging indefinitely
         try:
-            # Note: SSETransport might need adjustments based on actual server capabilities (WS?)
-            client = Client(transport=SSETransport(url))
             # FastMCPProxy.from_client is now implicitly handled by FastMCPProxy's init/methods
             # We just need the client instance for the FastMCPProxy
             # The FastMCPProxy itself needs to be initialized, not just created from client
@@ -351,14 +571,28 @@ async def create_proxy_server():
          exit(1) # Or raise an exception
 
     print(f"\nSuccessfully connected to {len(proxies)} upstream servers.")
-    return MultiFastMCP(proxies)
+    server = MultiFastMCP(proxies)
+    # Open the persistent upstream sessions and warm up the capability maps
+    # before the port is bound, so the first client request does not pay
+    # the upstream handshake and discovery latency.
+    await server.connect()
+    await server._ensure_maps()
+    return server
+
+
+async def main():
+    """Creates the proxy server and serves it on the same event loop."""
+    proxy_server = await create_proxy_server()
+    print(f"\nStarting {proxy_server.name} server on http://0.0.0.0:9000 ...")
+    # run_sse_async closes the upstream sessions when the server stops
+    await proxy_server.run_sse_async(host="0.0.0.0", port=9000)
 
 
 def run_proxy_server():
     try:
-        proxy_server = asyncio.run(create_proxy_server())
-        print(f"\nStarting {proxy_server.name} server on http://0.0.0.0:9000 ...")
-        asyncio.run(proxy_server.run_sse_async(host="0.0.0.0", port=9000))
+        # A single event loop for setup and serving: the upstream sessions,
+        # locks and events created during setup are bound to it.
+        asyncio.run(main())
     except Exception as e:
         print(f"\nAn error occurred during server setup or run: {e}")
         import traceback
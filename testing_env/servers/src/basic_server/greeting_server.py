@@ -1,7 +1,8 @@
-import json
 import logging
+import orjson
 import mcp.types as types
 from mcp.server.lowlevel import Server
+from mcp.server.lowlevel.helper_types import ReadResourceContents
 from mcp.server.sse import SseServerTransport
 from starlette.applications import Starlette
 from starlette.routing import Mount, Route
@@ -15,6 +16,17 @@ USERS = [
     {"id": "3", "name": "Charlie", "active": False},
 ]
 
+USERS_BY_ID = {user["id"]: user for user in USERS}
+
+# USERS is constant, so the resource contents are serialized and wrapped once at import
+_USERS_CONTENTS = [ReadResourceContents(content=orjson.dumps(USERS).decode(), mime_type="application/json")]
+_USER_CONTENTS_BY_ID = {
+    user_id: [ReadResourceContents(content=orjson.dumps(user).decode(), mime_type="application/json")]
+    for user_id, user in USERS_BY_ID.items()
+}
+_UNKNOWN_USER_CONTENTS = [ReadResourceContents(content="", mime_type="application/json")]
+_WAVE_CONTENTS = [ReadResourceContents(content="👋", mime_type="text/plain")]
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("greeting-server")
 
@@ -37,7 +49,7 @@ async def handle_list_resources() -> list[types.Resource]:
             uri=AnyUrl("data://users"),
             name="Users",
             description="A list of users.",
-            mimeType="text/plain",
+            mimeType="application/json",
         ),
         # types.Resource(
         #     uri=AnyUrl("data://user/{user_id}"),
@@ -46,16 +58,17 @@ async def handle_list_resources() -> list[types.Resource]:
     ]
 
 @server.read_resource()
-async def handle_read_resource(uri: AnyUrl) -> str | bytes | Iterable[types.TextResourceContents]:
+async def handle_read_resource(uri: AnyUrl) -> Iterable[ReadResourceContents]:
     logger.info("handle_read_resource")
-    if uri == "resource://wave":
-        return "👋"
-    elif uri == "data://users":
-        return json.dumps(USERS)
-    elif uri == "data://user/{user_id}":
-        user_id = uri.split("/")[-1]
-        user = next((user for user in USERS if user["id"] == user_id), None)
-        return json.dumps(user) if user else ""
+    # uri is a pydantic AnyUrl: compare and split its string form
+    uri_str = str(uri)
+    if uri_str == "resource://wave":
+        return _WAVE_CONTENTS
+    elif uri_str == "data://users":
+        return _USERS_CONTENTS
+    elif uri_str.startswith("data://user/"):
+        user_id = uri_str.rsplit("/", 1)[-1]
+        return _USER_CONTENTS_BY_ID.get(user_id, _UNKNOWN_USER_CONTENTS)
     else:
         raise ValueError(f"Unknown resource: {uri}")
 
@@ -1,35 +1,126 @@
+import logging
+import fastjsonschema
 import mcp.types as types
 from mcp.server.lowlevel import Server
 from mcp.server.sse import SseServerTransport
 from starlette.applications import Starlette
 from starlette.routing import Mount, Route
+from typing import Any, Awaitable, Callable
+
+logger = logging.getLogger("twitter-server")
 
 server = Server("twitter-server")
 
+# Rendered "- name: content" lines in note order, updated in place by add-note.
+# Handlers never await while touching the notes, so on the single-threaded event loop
+# no reader can observe a half-applied update.
+_note_lines: list[str] = []
+# Note name -> position of its line in _note_lines (insertion order)
+_note_index: dict[str, int] = {}
+# Bumped by every add-note; cached prompt results are only valid for the version they were rendered at
+_notes_version = 0
+# Last rendered summarize-notes result per detailed flag, with the version it was rendered at
+_summary_cache: dict[bool, tuple[int, types.GetPromptResult]] = {}
+
+def _render_note(name: str, content: str) -> str:
+    return f"- {name}: {content}"
+
+_SEARCH_TWITTER_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "query": {"type": "string"},
+        "sort_by": {"type": "string"},
+        "count": {"type": "integer"},
+    },
+    "required": ["query"],
+}
+_GREET_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "name": {"type": "string"},
+    },
+    "required": ["name"],
+}
+_ADD_NOTE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "name": {"type": "string", "minLength": 1},
+        "content": {"type": "string", "minLength": 1},
+    },
+    "required": ["name", "content"],
+}
+# The tool catalog is static, so it is built once and the same list is returned on every call
+_TOOLS: list[types.Tool] = [
+    types.Tool(
+        name="search-twitter",
+        description="Search Twitter with a query. Sort by 'Top' or 'Latest'",
+        inputSchema=_SEARCH_TWITTER_SCHEMA,
+    )
+]
+
 @server.list_tools()
 async def handle_list_tools() -> list[types.Tool]:
     """
     List available tools.
     Each tool specifies its arguments using JSON Schema validation.
     """
-    print("handle_list_tools")
+    logger.debug("handle_list_tools")
 
+    return _TOOLS
+
+async def _handle_greet(
+    arguments: dict,
+) -> list[types.TextContent | types.ImageContent | types.EmbeddedResource]:
+    # Presence is enforced by _GREET_SCHEMA before the handler runs
+    name = arguments["name"]
     return [
-        types.Tool(
-            name="search-twitter",
-            description="Search Twitter with a query. Sort by 'Top' or 'Latest'",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "query": {"type": "string"},
-                    "sort_by": {"type": "string"},
-                    "count": {"type": "integer"},
-                },
-                "required": ["query"],
-            },
+        types.TextContent(
+            type="text",
+            text=f"Hello, {name}!",
         )
     ]
 
+async def _handle_add_note(
+    arguments: dict,
+) -> list[types.TextContent | types.ImageContent | types.EmbeddedResource]:
+    global _notes_version
+
+    # Presence and non-emptiness are enforced by _ADD_NOTE_SCHEMA before the handler runs
+    note_name = arguments["name"]
+    note_content = arguments["content"]
+
+    # Update server state
+    logger.debug("note name: %s - note content: %s", note_name, note_content)
+    line = _render_note(note_name, note_content)
+    i = _note_index.get(note_name)
+    if i is not None:
+        # Overwriting keeps the note's position: only its own line is re-rendered
+        _note_lines[i] = line
+    else:
+        _note_index[note_name] = len(_note_lines)
+        _note_lines.append(line)
+    _notes_version += 1
+
+    # Notify clients that resources have changed
+    # await server.request_context.session.send_resource_list_changed()
+
+    return [
+        types.TextContent(
+            type="text",
+            text=f"Added note '{note_name}' with content: {note_content}",
+        )
+    ]
+
+_ToolHandler = Callable[[dict], Awaitable[list[types.TextContent | types.ImageContent | types.EmbeddedResource]]]
+
+# Tool name -> (compiled argument validator, handler), resolved once at import so a call
+# does a single dict lookup for both. A validator raises fastjsonschema.JsonSchemaException
+# (a ValueError) on invalid input.
+_TOOL_HANDLERS: dict[str, tuple[Callable[[dict], Any], _ToolHandler]] = {
+    "greet": (fastjsonschema.compile(_GREET_SCHEMA), _handle_greet),
+    "add-note": (fastjsonschema.compile(_ADD_NOTE_SCHEMA), _handle_add_note),
+}
+
 @server.call_tool()
 async def handle_call_tool(
     name: str, arguments: dict | None
@@ -38,40 +129,20 @@ async def handle_call_tool(
     Handle tool execution requests.
     Tools can modify server state and notify clients of changes.
     """
-    if name != "add-note" and name != "greet":
+    entry = _TOOL_HANDLERS.get(name)
+    if entry is None:
         raise ValueError(f"Unknown tool: {name}")
+    validate, handler = entry
 
     if not arguments:
         raise ValueError("Missing arguments")
 
-    if name == "greet":
-        name = arguments.get("name")
-        return [
-            types.TextContent(
-                type="text",
-                text=f"Hello, {name}!",
-            )
-        ]
-    elif name == "add-note":
-        note_name = arguments.get("name")
-        note_content = arguments.get("content")
-
-        if not note_name or not note_content:
-            raise ValueError("Missing name or content")
+    validate(arguments)
 
-        # Update server state
-        print(f"note name: {note_name} - note content: {note_content}")
-        notes[note_name] = note_content
+    return await handler(arguments)
 
-        # Notify clients that resources have changed
-        # await server.request_context.session.send_resource_list_changed()
-
-    return [
-        types.TextContent(
-            type="text",
-            text=f"Added note '{note_name}' with content: {note_content}",
-        )
-    ]
+_PROMPT_HEADER_BRIEF = "Here are the current notes to summarize:\n\n"
+_PROMPT_HEADER_DETAILED = "Here are the current notes to summarize: Give extensive details.\n\n"
 
 @server.get_prompt()
 async def handle_get_prompt(
@@ -85,7 +156,19 @@ async def handle_get_prompt(
         raise ValueError(f"Unknown prompt: {name}")
 
     style = (arguments or {}).get("style", "brief")
-    detail_prompt = " Give extensive details." if style == "detailed" else ""
+    detailed = style == "detailed"
+
+    # Repeated prompts over unchanged notes reuse the last rendered result
+    cached = _summary_cache.get(detailed)
+    if cached is not None and cached[0] == _notes_version:
+        return cached[1]
+    result = _summarize_notes(detailed, _note_lines)
+    _summary_cache[detailed] = (_notes_version, result)
+    return result
+
+def _summarize_notes(detailed: bool, lines: list[str]) -> types.GetPromptResult:
+    """Renders the summarize-notes prompt from the rendered note lines."""
+    header = _PROMPT_HEADER_DETAILED if detailed else _PROMPT_HEADER_BRIEF
 
     return types.GetPromptResult(
         description="Summarize the current notes",
@@ -94,31 +177,51 @@ async def handle_get_prompt(
                 role="user",
                 content=types.TextContent(
                     type="text",
-                    text=f"Here are the current notes to summarize:{detail_prompt}\n\n"
-                    + "\n".join(
-                        f"- {name}: {content}"
-                        for name, content in notes.items()
-                    ),
+                    text=header + "\n".join(lines),
                 ),
             )
         ],
     )
 
+# The handlers are all registered above, so the advertised capabilities are fixed from here on
+_INIT_OPTIONS = server.create_initialization_options()
+
 sse = SseServerTransport("/messages/")
 
-async def handle_sse(request):
-    print("handle_sse")
-    async with sse.connect_sse(request.scope, request.receive, request._send) as streams:
-        await server.run(streams[0], streams[1], server.create_initialization_options())
+class SseEndpoint:
+    """
+    Plain ASGI app for the /sse route.
+    Starlette passes non-function endpoints the raw (scope, receive, send), so no
+    Request object is built per connection and no response is expected afterwards.
+    """
+    async def __call__(self, scope, receive, send):
+        logger.debug("handle_sse")
+        async with sse.connect_sse(scope, receive, send) as streams:
+            await server.run(streams[0], streams[1], _INIT_OPTIONS)
+
+handle_sse = SseEndpoint()
 
 starlette_app = Starlette(
     debug=True,
     routes=[
-        Route("/sse", endpoint=handle_sse),
+        Route("/sse", endpoint=handle_sse, methods=["GET"]),
         Mount("/messages/", app=sse.handle_post_message),
     ],
 )
 
 if __name__ == "__main__":
+    import os
     import uvicorn
-    uvicorn.run(starlette_app, host="0.0.0.0", port=8002)
+    logging.basicConfig(level=logging.WARNING)
+    # SSE sessions (and notes) live in the worker process that accepted the /sse connection,
+    # so more than one worker requires session-affinity routing in front of the server.
+    workers = int(os.environ.get("WEB_CONCURRENCY", "1"))
+    # uvicorn's default "auto" loop and HTTP implementations pick uvloop and httptools
+    # when uvicorn[standard] installed them, and fall back to asyncio and h11 otherwise
+    uvicorn.run(
+        "twitter_server:starlette_app",
+        host="0.0.0.0",
+        port=8002,
+        workers=workers,
+        log_level="warning",
+    )